@@ -6,32 +6,37 @@ This script reads an Anki deck (either .apkg or CSV format) and automatically
 adds images to notes that have empty image fields by searching Bing Image Search.
 
 Requirements:
-- requests: For HTTP requests and image downloads
-- beautifulsoup4: For HTML parsing
+- aiohttp: For concurrent image downloads
+- duckduckgo-search: For image searches
 - genanki: For creating Anki deck files
 - Pillow: For image processing
 - pandas: For CSV handling
+
+Third-party packages are imported where they are first needed, so
+`--help` and argument errors don't pay for loading them.
 """
 
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
 import os
+import random
 import re
-import time
 import urllib.parse
-import urllib.request
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 import logging
-
-# Third-party imports
-import requests
-from bs4 import BeautifulSoup
-import genanki
-import pandas as pd
-from PIL import Image
 import io
-from duckduckgo_search import DDGS
 import html
 
+if TYPE_CHECKING:
+    import aiohttp
+    import genanki
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -43,6 +48,127 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Host that DDGS image searches are sent to
+DDG_HOST = 'duckduckgo.com'
+# Image results fetched per search; the extras are download fallbacks
+SEARCH_RESULTS_PER_QUERY = 5
+# Search results kept in the on-disk cache (least recently used are dropped)
+SEARCH_CACHE_SIZE = 4096
+# Download retry policy for transient HTTP errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DOWNLOAD_RETRIES = 2
+RETRY_BACKOFF = 0.3  # seconds, doubled after each attempt
+# Leading bytes of the image formats Pillow can decode for us
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF8', b'RIFF')
+
+# Filename cleanup patterns used by generate_filename
+_NON_WORD_RE = re.compile(r'[^\w\s-]')
+_DASH_SPACE_RE = re.compile(r'[-\s]+')
+# ASCII fast path for _NON_WORD_RE: delete every ASCII char that isn't \w, whitespace or '-'
+_ASCII_NON_WORD = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c in '_-' or c.isspace())
+))
+
+
+def _first_bullet(text: str) -> str:
+    """Return the first non-empty part of a bullet-separated (▪) list."""
+    # Split by bullet points and take the first non-empty part
+    for part in text.split('▪'):
+        part = part.strip()
+        if part:
+            return part
+    return text
+
+
+def _process_image_worker(data: bytes, image_path: Path, max_size: Tuple[int, int], quality: int) -> bool:
+    """
+    Process downloaded image (resize, optimize, etc.) and save it as JPEG.
+    
+    The image is decoded from memory, and JPEGs are decoded at a reduced
+    scale close to the target size, so large photos are never fully
+    decoded or written to disk at their original size. JPEGs that are
+    already small enough are saved unchanged. It takes plain arguments
+    and touches no shared state, so it is safe to run on worker threads.
+    
+    Args:
+        data: Raw bytes of the downloaded image
+        image_path: Path to save the processed image to
+        max_size: Maximum (width, height) of the saved image
+        quality: JPEG quality to save with
+    
+    Returns:
+        True if the image was saved, False otherwise
+    """
+    from PIL import Image
+    
+    # Write to a temporary file and move it into place, so a half-written
+    # image is never picked up as an existing download
+    part_path = image_path.with_name(image_path.name + '.part')
+    try:
+        max_width, max_height = max_size
+        with Image.open(io.BytesIO(data)) as img:
+            # Image.open only parses the header, so small JPEGs that are
+            # already usable as-is are saved without decoding them
+            if (img.format == 'JPEG' and img.mode in ('RGB', 'L')
+                    and img.width <= max_width and img.height <= max_height):
+                with open(part_path, 'wb') as f:
+                    f.write(data)
+                os.replace(part_path, image_path)
+                return True
+            
+            # Let libjpeg pick a 1/2, 1/4 or 1/8 DCT scale during decode;
+            # keep 2x headroom so the Lanczos resize below still has detail
+            img.draft('RGB', (max_width * 2, max_height * 2))
+            
+            # Convert to RGB if necessary
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            
+            # Resize if too large
+            if img.width > max_width or img.height > max_height:
+                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+                logger.info(f"Resized image to {img.width}x{img.height}")
+            # Progressive + optimized Huffman tables shrink files with no visible loss
+            img.save(part_path, 'JPEG', quality=quality,
+                     optimize=True, progressive=True, subsampling='4:2:0')
+        os.replace(part_path, image_path)
+        return True
+    
+    except Exception as e:
+        logger.warning(f"Error processing image {image_path}: {e}")
+        part_path.unlink(missing_ok=True)
+        return False
+
+
+# genanki Package subclass, created on first use so genanki is imported lazily
+_UnjournaledPackage = None
+
+
+def _unjournaled_package_class() -> type:
+    """Return a genanki Package subclass that builds its collection without a journal or fsync."""
+    global _UnjournaledPackage
+    if _UnjournaledPackage is None:
+        import genanki
+        
+        class UnjournaledPackage(genanki.Package):
+            def write_to_db(self, cursor, *args, **kwargs):
+                # The collection is a temp file that is zipped and discarded right
+                # after, so crash safety buys nothing here
+                cursor.execute('PRAGMA journal_mode=OFF')
+                cursor.execute('PRAGMA synchronous=OFF')
+                super().write_to_db(cursor, *args, **kwargs)
+        
+        _UnjournaledPackage = UnjournaledPackage
+    return _UnjournaledPackage
+
+
+def is_pillow_simd() -> bool:
+    """Return True if Pillow is the SIMD-accelerated pillow-simd build."""
+    import PIL
+    
+    # pillow-simd is versioned as the matching Pillow release plus a .postN suffix
+    return '.post' in PIL.__version__
+
 
 class AnkiImageUpdater:
     """Main class for updating Anki decks with images."""
@@ -62,8 +188,11 @@ class AnkiImageUpdater:
             'images_dir': 'images',
             'delay_between_searches': 1.0,  # seconds
             'max_image_size': (800, 600),   # width, height
+            'jpeg_quality': 82,
             'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'search_field': 'answer'  # 'question' or 'answer' - which field to use for image search
+            'search_field': 'answer',  # 'question' or 'answer' - which field to use for image search
+            'max_concurrent_notes': 4,  # notes searched/downloaded at the same time
+            'max_requests_per_host': 4  # in-flight requests per hostname
         }
         
         # Create output directories
@@ -72,11 +201,27 @@ class AnkiImageUpdater:
         self.output_path.mkdir(exist_ok=True)
         self.images_path.mkdir(exist_ok=True)
         
+        # One DDGS session reused for every search, created on first use
+        self._ddgs = None
+        # Cleaned query -> image URLs, kept across runs so reruns skip DDG
+        self._search_cache_path = self.output_path / 'ddg_cache.json'
+        self._search_cache = self._load_search_cache()
+        # Cleaned query -> (image URL, filename) of the image already added for it
+        self._query_cache: Dict[str, Tuple[str, str]] = {}
+        # Filename -> path of every image added to notes in this run
+        self._media_files: Dict[str, str] = {}
+        
+        # Image processing runs on threads alongside the network I/O (Pillow
+        # releases the GIL while resizing/encoding); created per run
+        self._image_pool: Optional[ThreadPoolExecutor] = None
+        
         # Initialize Anki model
         self.model = self._create_anki_model()
         
     def _create_anki_model(self) -> genanki.Model:
         """Create an Anki model for cards with images."""
+        import genanki
+        
         return genanki.Model(
             1607392319,  # Random model ID
             'Image Model',
@@ -109,6 +254,8 @@ class AnkiImageUpdater:
         Returns:
             List of dictionaries representing notes
         """
+        import pandas as pd
+        
         logger.info(f"Reading CSV deck from {csv_path}")
         
         try:
@@ -120,6 +267,16 @@ class AnkiImageUpdater:
             if missing_fields:
                 raise ValueError(f"Missing required fields: {missing_fields}")
             
+            # Replace NaN from empty cells with '' up front, so notes only
+            # ever hold strings
+            for field in required_fields:
+                df[field] = df[field].fillna('').astype(str)
+            image_field = self.config['image_field']
+            if image_field in df.columns:
+                df[image_field] = df[image_field].fillna('').astype(str).str.strip()
+            else:
+                df[image_field] = ''
+            
             # Convert DataFrame to list of dictionaries
             notes = df.to_dict('records')
             logger.info(f"Successfully read {len(notes)} notes from CSV")
@@ -142,7 +299,7 @@ class AnkiImageUpdater:
         import zipfile
         import sqlite3
         import tempfile
-        import os
+        import pandas as pd
         
         logger.info(f"Reading APKG deck from {apkg_path}")
         
@@ -160,49 +317,43 @@ class AnkiImageUpdater:
                     
                     # Connect to the SQLite database
                     conn = sqlite3.connect(collection_path)
-                    cursor = conn.cursor()
-                    
-                    # First, let's see what tables exist
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                    tables = [row[0] for row in cursor.fetchall()]
-                    logger.info(f"Available tables: {tables}")
-                    
-                    # Get the notes from the database
-                    cursor.execute("SELECT flds, tags FROM notes LIMIT 1000")
-                    
-                    rows = cursor.fetchall()
-                    conn.close()
+                    try:
+                        # The extracted collection is a throwaway copy that is only
+                        # read, so skip journaling/fsync and memory-map the file
+                        conn.executescript(
+                            "PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF; "
+                            "PRAGMA temp_store=MEMORY; PRAGMA mmap_size=268435456;"
+                        )
+                        
+                        # First, let's see what tables exist
+                        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+                        logger.info(f"Available tables: {tables}")
+                        
+                        # Get the notes from the database
+                        df = pd.read_sql_query("SELECT flds, tags FROM notes", conn)
+                    finally:
+                        conn.close()
                     
-                    if not rows:
+                    if df.empty:
                         logger.warning("No notes found in APKG file")
                         return []
                     
-                    # Parse the notes
-                    notes = []
-                    for row in rows:
-                        flds, tags = row
-                        
-                        # Split fields (Anki uses 0x1f as field separator)
-                        fields = flds.split('\x1f')
-                        
-                        # Create note dictionary
-                        note = {
-                            'tags': tags
-                        }
-                        
-                        # Map fields based on common Anki models
-                        if len(fields) >= 2:
-                            note[self.config['question_field']] = fields[0] if len(fields) > 0 else ''
-                            note[self.config['answer_field']] = fields[1] if len(fields) > 1 else ''
-                            note[self.config['image_field']] = fields[2] if len(fields) > 2 else ''
-                        else:
-                            # If we have fewer fields, just use what we have
-                            note[self.config['question_field']] = fields[0] if len(fields) > 0 else ''
-                            note[self.config['answer_field']] = fields[0] if len(fields) > 0 else ''  # Use same as question if only one field
-                            note[self.config['image_field']] = ''
-                        
-                        notes.append(note)
+                    # Split fields (Anki uses 0x1f as field separator); missing
+                    # trailing fields come back as None. Only the first three
+                    # fields are used, so stop splitting after them (column 3
+                    # holds the unsplit remainder and is ignored)
+                    fields = df['flds'].str.split('\x1f', n=3, expand=True)
+                    
+                    # Map fields based on common Anki models
+                    question_field = self.config['question_field']
+                    answer_field = self.config['answer_field']
+                    image_field = self.config['image_field']
+                    df[question_field] = fields[0]
+                    # Use same as question if only one field
+                    df[answer_field] = fields[1].fillna(fields[0]) if 1 in fields.columns else fields[0]
+                    df[image_field] = fields[2].fillna('').str.strip() if 2 in fields.columns else ''
                     
+                    notes = df[['tags', question_field, answer_field, image_field]].to_dict('records')
                     logger.info(f"Successfully read {len(notes)} notes from APKG")
                     return notes
                     
@@ -210,39 +361,165 @@ class AnkiImageUpdater:
             logger.error(f"Error reading APKG file: {e}")
             raise
     
-    def search_duckduckgo_images(self, query: str) -> Optional[str]:
+    async def _wait_for_search_slot(self):
         """
-        Search DuckDuckGo Images for a query and return the first image URL using duckduckgo-search library (DDGS().images).
-        Args:
-            query: Search query string
-        Returns:
-            URL of the first image found, or None if no image found
+        Space DuckDuckGo searches at least `delay_between_searches` apart.
+
+        Only the start of each search is serialized; downloads of other notes
+        keep running while a search waits for its slot. The delay is jittered
+        upwards only (up to 1.5x) so searches don't fire in lockstep while
+        the configured delay stays a real minimum.
         """
+        loop = asyncio.get_running_loop()
+        async with self._search_lock:
+            wait = self._next_search_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            delay = self.config['delay_between_searches']
+            self._next_search_at = loop.time() + delay * random.uniform(1.0, 1.5)
+    
+    def _host_gate(self, url: str) -> asyncio.Semaphore:
+        """
+        Return the concurrency gate for the host of a URL.
+        
+        Requests beyond `max_requests_per_host` wait in the semaphore's FIFO
+        queue and are resumed as earlier requests to the same host finish, so
+        a slow host never holds back downloads from other hosts.
+        """
+        return self._host_semaphores[urllib.parse.urlparse(url).netloc]
+    
+    def _search_ddgs(self, clean_query: str) -> List[str]:
+        """Blocking DDGS images lookup returning the image URLs found."""
+        results = self._ddgs.images(clean_query, max_results=SEARCH_RESULTS_PER_QUERY, safesearch='Moderate')
+        return [result['image'] for result in results if result.get('image')]
+    
+    def _load_search_cache(self) -> "OrderedDict[str, List[str]]":
+        """Load search results cached by earlier runs."""
+        if not self._search_cache_path.exists():
+            return OrderedDict()
+        try:
+            with open(self._search_cache_path, 'r', encoding='utf-8') as f:
+                cache = OrderedDict(json.load(f))
+            logger.info(f"Loaded {len(cache)} cached DuckDuckGo searches")
+            return cache
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable search cache {self._search_cache_path}: {e}")
+            return OrderedDict()
+    
+    def _save_search_cache(self):
+        """Persist cached search results for the next run."""
+        try:
+            with open(self._search_cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self._search_cache, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Could not save search cache {self._search_cache_path}: {e}")
+    
+    @staticmethod
+    def _clean_query(query: str) -> str:
+        """Remove HTML entities, sound tags, etc. from a search query."""
+        clean_query = html.unescape(query)
+        clean_query = clean_query.split('[sound:')[0].strip()
+        return clean_query.replace('\xa0', ' ').replace('&nbsp;', ' ')
+    
+    async def _search_image_urls(self, clean_query: str) -> List[str]:
+        """Run a single DDGS search for an already cleaned query."""
         try:
-            # Clean up the query: remove HTML entities, sound tags, etc.
-            clean_query = html.unescape(query)
-            clean_query = clean_query.split('[sound:')[0].strip()
-            clean_query = clean_query.replace('\xa0', ' ').replace('&nbsp;', ' ')
-            # Use DDGS().images from duckduckgo-search
+            await self._wait_for_search_slot()
+            # Use DDGS images from duckduckgo-search (blocking, so run it off the event loop)
             logger.info(f"Searching DuckDuckGo Images (DDGS) for query: {clean_query}")
-            with DDGS() as ddgs:
-                results = ddgs.images(clean_query, max_results=1, safesearch='Moderate')
-                for result in results:
-                    image_url = result.get('image')
-                    if image_url:
-                        logger.info(f"Found DuckDuckGo image URL: {image_url}")
-                        return image_url
-            logger.warning(f"No DuckDuckGo image found for query: {clean_query}")
-            return None
+            async with self._host_semaphores[DDG_HOST]:
+                image_urls = await asyncio.to_thread(self._search_ddgs, clean_query)
+            if image_urls:
+                logger.info(f"Found {len(image_urls)} DuckDuckGo image URLs, first: {image_urls[0]}")
+                self._search_cache[clean_query] = image_urls
+                if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+            else:
+                logger.warning(f"No DuckDuckGo image found for query: {clean_query}")
+            return image_urls
         except Exception as e:
             logger.error(f"Error searching DuckDuckGo images (DDGS): {e}")
-            return None
+            return []
+    
+    async def search_duckduckgo_images(self, query: str, refresh: bool = False) -> List[str]:
+        """
+        Search DuckDuckGo Images for a query using duckduckgo-search library (DDGS().images).
+        
+        Notes sharing the same cleaned query share a single search, and
+        results found in earlier runs are reused without searching again.
+        
+        Args:
+            query: Search query string
+            refresh: Drop results cached by earlier runs and search again
+        Returns:
+            URLs of the images found, best match first (empty if no image found)
+        """
+        clean_query = self._clean_query(query)
+        if refresh:
+            self._search_cache.pop(clean_query, None)
+        else:
+            cached = self._search_cache.get(clean_query)
+            if cached:
+                self._search_cache.move_to_end(clean_query)
+                logger.info(f"Using cached DuckDuckGo results for query: {clean_query}")
+                return cached
+        
+        search = self._searches.get(clean_query)
+        if search is None:
+            search = asyncio.ensure_future(self._search_image_urls(clean_query))
+            self._searches[clean_query] = search
+        return await search
+    
+    async def _fetch_image(self, session: aiohttp.ClientSession, image_url: str) -> Optional[bytes]:
+        """
+        Fetch the body of an image URL, retrying transient errors.
+        
+        HTTP 429/5xx responses, connection errors and timeouts are retried
+        with exponential backoff.
+        
+        Args:
+            session: HTTP session used for the download
+            image_url: URL of the image to download
+            
+        Returns:
+            Image bytes, or None if the URL does not point to an image
+            (the body is not read any further in that case)
+        """
+        import aiohttp
+        
+        timeout = aiohttp.ClientTimeout(total=15)
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            last_attempt = attempt == DOWNLOAD_RETRIES
+            try:
+                async with self._host_gate(image_url), session.get(image_url, timeout=timeout) as response:
+                    if response.status not in RETRY_STATUSES or last_attempt:
+                        response.raise_for_status()
+                        
+                        # Check if it's actually an image from its first bytes; many
+                        # servers send real images as application/octet-stream
+                        try:
+                            head = await response.content.readexactly(16)
+                        except asyncio.IncompleteReadError as e:
+                            head = e.partial
+                        if not head.startswith(IMAGE_SIGNATURES) or (head.startswith(b'RIFF') and head[8:12] != b'WEBP'):
+                            content_type = response.headers.get('content-type', '')
+                            logger.warning(f"URL does not point to an image: {content_type}")
+                            return None
+                        return head + await response.content.read()
+                    logger.info(f"Got HTTP {response.status} from {image_url}, retrying")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last_attempt:
+                    raise
+                logger.info(f"Error fetching {image_url} ({type(e).__name__}: {e}), retrying")
+            # Back off outside the host gate so other downloads can proceed
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
     
-    def download_image(self, image_url: str, filename: str) -> Optional[str]:
+    async def download_image(self, session: aiohttp.ClientSession, image_url: str, filename: str) -> Optional[str]:
         """
         Download an image from URL and save it locally.
         
         Args:
+            session: HTTP session used for the download
             image_url: URL of the image to download
             filename: Local filename to save the image as
             
@@ -252,171 +529,290 @@ class AnkiImageUpdater:
         try:
             logger.info(f"Downloading image from {image_url}")
             
-            # Set headers for image download
-            headers = {
-                'User-Agent': self.config['user_agent'],
-                'Referer': 'https://www.bing.com/',
-            }
-            
             # Download the image
-            response = requests.get(image_url, headers=headers, timeout=15, stream=True)
-            response.raise_for_status()
-            
-            # Check if it's actually an image
-            content_type = response.headers.get('content-type', '')
-            if not content_type.startswith('image/'):
-                logger.warning(f"URL does not point to an image: {content_type}")
+            data = await self._fetch_image(session, image_url)
+            if data is None:
                 return None
             
-            # Save the image
+            # Decode, resize and save the image in one pass
             image_path = self.images_path / filename
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # Process the image (resize if needed)
-            self._process_image(image_path)
+            loop = asyncio.get_running_loop()
+            saved = await loop.run_in_executor(
+                self._image_pool, _process_image_worker, data, image_path,
+                tuple(self.config['max_image_size']), self.config.get('jpeg_quality', 82)
+            )
+            if not saved:
+                return None
             
             logger.info(f"Successfully downloaded image to {image_path}")
+            self._media_files[filename] = str(image_path)
             return str(image_path)
             
         except Exception as e:
             logger.error(f"Error downloading image: {e}")
             return None
     
-    def _process_image(self, image_path: Path):
+    def generate_filename(self, query: str, image_url: str) -> str:
         """
-        Process downloaded image (resize, optimize, etc.).
+        Generate a safe filename for an image based on the search query.
+        
+        The filename ends with a hash of the image URL, so rerunning the same
+        query finds the image saved by an earlier run instead of downloading
+        it again.
         
         Args:
-            image_path: Path to the image file
+            query: Search query used to find the image
+            image_url: URL the image is downloaded from
+            
+        Returns:
+            Safe filename with extension
         """
-        try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_width, max_height = self.config['max_image_size']
-                if img.width > max_width or img.height > max_height:
-                    img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                    img.save(image_path, 'JPEG', quality=85, optimize=True)
-                    logger.info(f"Resized image to {img.width}x{img.height}")
-                    
-        except Exception as e:
-            logger.warning(f"Error processing image {image_path}: {e}")
+        # Clean the query for filename
+        query = query.lower()
+        if query.isascii():
+            safe_query = query.translate(_ASCII_NON_WORD)
+        else:
+            safe_query = _NON_WORD_RE.sub('', query)
+        safe_query = _DASH_SPACE_RE.sub('-', safe_query)
+        safe_query = safe_query[:40]  # Limit length
+        
+        url_hash = hashlib.blake2b(image_url.encode(), digest_size=8).hexdigest()
+        return f"{safe_query}-{url_hash}.jpg"
+    
+    async def _download_or_reuse(self, session: aiohttp.ClientSession, image_url: str, filename: str) -> Optional[str]:
+        """Download an image to `filename` unless an earlier run already saved it there."""
+        image_path = self.images_path / filename
+        # Images are moved into place only once fully written, so an existing
+        # file is always complete
+        if image_path.exists():
+            logger.info(f"Reusing previously downloaded image {image_path}")
+            self._media_files[filename] = str(image_path)
+            return filename
+        if await self.download_image(session, image_url, filename):
+            return filename
+        return None
     
-    def generate_filename(self, query: str, index: int) -> str:
+    async def _download_once(self, session: aiohttp.ClientSession, image_url: str, filename: str) -> Optional[str]:
         """
-        Generate a safe filename for an image based on the search query.
+        Download an image unless it is already on disk or being downloaded.
+        
+        Each URL is downloaded at most once per run. If another note already
+        fetched it under a different filename, that filename is returned.
         
         Args:
-            query: Search query used to find the image
-            index: Index number to ensure uniqueness
+            session: HTTP session used for the download
+            image_url: URL of the image to download
+            filename: Local filename to save the image as
             
         Returns:
-            Safe filename with extension
+            Filename the image was saved as, or None if download failed
         """
-        # Clean the query for filename
-        safe_query = re.sub(r'[^\w\s-]', '', query.lower())
-        safe_query = re.sub(r'[-\s]+', '-', safe_query)
-        safe_query = safe_query[:50]  # Limit length
+        # Notes that resolve to the same image wait on a single download
+        download = self._downloads.get(image_url)
+        if download is None:
+            download = asyncio.ensure_future(self._download_or_reuse(session, image_url, filename))
+            self._downloads[image_url] = download
+        return await download
+    
+    async def _download_first(self, session: aiohttp.ClientSession, search_query_text: str,
+                              image_urls: List[str]) -> Optional[Tuple[str, str]]:
+        """
+        Download the first of the image URLs that works.
         
-        return f"{safe_query}-{index}.jpg"
+        Returns:
+            (image URL, filename) of the downloaded image, or None if all failed
+        """
+        for image_url in image_urls:
+            filename = await self._download_once(
+                session, image_url, self.generate_filename(search_query_text, image_url)
+            )
+            if filename:
+                return image_url, filename
+        return None
     
-    def update_notes_with_images(self, notes: List[Dict]) -> List[Dict]:
+    def _select_notes_for_search(self, notes: List[Dict]) -> Tuple[str, List[Tuple[int, str]]]:
         """
-        Update notes by adding images where the image field is empty.
+        Find the notes with an empty image field and the text to search for each.
+        
+        Runs once over every note, so config lookups and the question/answer
+        choice are resolved before the loop rather than per note.
         
         Args:
             notes: List of note dictionaries
             
         Returns:
-            Updated list of notes with image paths
+            Name of the field used for search ('question' or 'answer'), and
+            (note index, search text) pairs for the notes that need an image
         """
-        logger.info(f"Processing {len(notes)} notes for image updates")
-        
-        updated_notes = []
-        image_count = 0
-        added_images_info = []  # Track which questions got images, their answers, and URLs
+        config = self.config
+        image_field = config['image_field']
+        # Determine which field to use for search based on configuration
+        if config.get('search_field', 'answer') == 'question':
+            field_name = 'question'
+            text_field = config['question_field']
+            # For questions, use the full text
+            to_query = None
+        else:  # default to answer
+            field_name = 'answer'
+            text_field = config['answer_field']
+            # Extract first part from bullet-separated list if it's an answer
+            to_query = _first_bullet
         
+        total = len(notes)
+        selected = []
         for i, note in enumerate(notes):
-            logger.info(f"Processing note {i+1}/{len(notes)}")
+            logger.info(f"Processing note {i+1}/{total}")
             
-            # Check if image field is empty
-            image_field = self.config['image_field']
-            current_image = note.get(image_field, '')
-            # Handle NaN values from pandas
-            if current_image is None or (isinstance(current_image, float) and str(current_image) == 'nan'):
-                current_image = ''
-            else:
-                current_image = str(current_image).strip()
+            # Check if image field is empty (the deck readers already turned
+            # missing values into empty strings)
+            current_image = note.get(image_field)
+            if current_image:
+                logger.info(f"Note {i+1} already has an image: {current_image}")
+                continue
+            
+            search_text = note.get(text_field)
+            if not search_text:
+                logger.warning(f"Empty {field_name} field for note {i+1}")
+                continue
+            
+            selected.append((i, to_query(search_text) if to_query else search_text))
+        return field_name, selected
+    
+    async def _process_note(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                            note: Dict, i: int, search_query_text: str, field_name: str) -> Optional[Dict]:
+        """
+        Search and download an image for a single note with an empty image field.
+        
+        Args:
+            session: HTTP session shared by all downloads
+            semaphore: Limits how many notes are processed at the same time
+            note: Note dictionary, updated in place
+            i: Index of the note in the deck
+            search_query_text: Text to search images for
+            field_name: Name of the field the search text came from
             
-            if not current_image:
-                # Determine which field to use for search based on configuration
-                search_field = self.config.get('search_field', 'answer')
-                if search_field == 'question':
-                    search_text = note.get(self.config['question_field'], '')
-                    field_name = 'question'
-                else:  # default to answer
-                    search_text = note.get(self.config['answer_field'], '')
-                    field_name = 'answer'
+        Returns:
+            Info about the added image, or None if no image was added
+        """
+        async with semaphore:
+            # Construct DuckDuckGo search URL
+            search_query = urllib.parse.quote(search_query_text)
+            search_url = f"https://duckduckgo.com/?q={search_query}&t=h_&iar=images&iax=images&ia=images"
+            
+            clean_query = self._clean_query(search_query_text)
+            cached = self._query_cache.get(clean_query)
+            if cached:
+                # An earlier note with the same query already got an image
+                image_url, filename = cached
+            else:
+                # Search for image
+                image_urls = await self.search_duckduckgo_images(search_query_text)
+                # No search ran for this query in this run, so the URLs came from the on-disk cache
+                from_cache = clean_query not in self._searches
                 
-                # Handle NaN values from pandas
-                if search_text is None or (isinstance(search_text, float) and str(search_text) == 'nan'):
-                    search_text = ''
-                else:
-                    search_text = str(search_text)
+                if not image_urls:
+                    logger.warning(f"No image found for note {i+1}")
+                    return None
                 
-                if search_text:
-                    # Extract first part from bullet-separated list if it's an answer
-                    if field_name == 'answer':
-                        # Split by bullet points and take the first non-empty part
-                        text_parts = [part.strip() for part in search_text.split('▪') if part.strip()]
-                        search_query_text = text_parts[0] if text_parts else search_text
-                    else:
-                        # For questions, use the full text
-                        search_query_text = search_text
-                    
-                    # Add delay to be respectful to the search engine
-                    if i > 0:
-                        time.sleep(self.config['delay_between_searches'])
-                    
-                    # Construct DuckDuckGo search URL
-                    search_query = urllib.parse.quote(search_query_text)
-                    search_url = f"https://duckduckgo.com/?q={search_query}&t=h_&iar=images&iax=images&ia=images"
-                    # Search for image
-                    image_url = self.search_duckduckgo_images(search_query_text)
-                    
-                    if image_url:
-                        # Generate filename and download image
-                        filename = self.generate_filename(search_query_text, image_count)
-                        local_path = self.download_image(image_url, filename)
-                        
-                        if local_path:
-                            # Update the note with the local image path
-                            note[image_field] = filename  # Use relative path for Anki
-                            image_count += 1
-                            added_images_info.append({
-                                'question': note.get(self.config['question_field'], ''),
-                                'answer': note.get(self.config['answer_field'], ''),
-                                'search_field': field_name,
-                                'search_text': search_query_text,
-                                'search_url': search_url,
-                                'image_url': image_url
-                            })
-                            logger.info(f"Added image to note: {filename}")
-                        else:
-                            logger.warning(f"Failed to download image for note {i+1}")
-                    else:
-                        logger.warning(f"No image found for note {i+1}")
-                else:
-                    logger.warning(f"Empty {field_name} field for note {i+1}")
-            else:
-                logger.info(f"Note {i+1} already has an image: {current_image}")
+                downloaded = await self._download_first(session, search_query_text, image_urls)
+                if not downloaded and from_cache:
+                    # Cached URLs can go stale between runs; search once more
+                    logger.info(f"All cached images failed for note {i+1}, searching again")
+                    image_urls = await self.search_duckduckgo_images(search_query_text, refresh=True)
+                    downloaded = await self._download_first(session, search_query_text, image_urls)
+                if not downloaded:
+                    logger.warning(f"Failed to download image for note {i+1}")
+                    return None
+                image_url, filename = downloaded
+                self._query_cache[clean_query] = downloaded
+            
+            # Update the note with the local image path
+            note[self.config['image_field']] = filename  # Use relative path for Anki
+            logger.info(f"Added image to note: {filename}")
+            return {
+                'question': note.get(self.config['question_field'], ''),
+                'answer': note.get(self.config['answer_field'], ''),
+                'search_field': field_name,
+                'search_text': search_query_text,
+                'search_url': search_url,
+                'image_url': image_url
+            }
+    
+    async def _update_notes_async(self, notes: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Process all notes that need an image concurrently.
+        
+        Args:
+            notes: List of note dictionaries
+            
+        Returns:
+            Info about added images for the notes that were searched (None
+            where no image was added)
+        """
+        import aiohttp
+        
+        field_name, selected = self._select_notes_for_search(notes)
+        if not selected:
+            return []
+        
+        if self._ddgs is None:
+            from duckduckgo_search import DDGS
+            self._ddgs = DDGS()
+        if is_pillow_simd():
+            logger.info("Using pillow-simd for image resizing")
+        
+        # Search pacing state shared by all note tasks
+        self._search_lock = asyncio.Lock()
+        self._next_search_at = 0.0
+        # In-flight and finished searches keyed by cleaned query
+        self._searches = {}
+        # In-flight and finished downloads keyed by image URL
+        self._downloads = {}
+        
+        # One concurrency gate per hostname, covering both DDG and image hosts
+        per_host = self.config.get('max_requests_per_host', 4)
+        self._host_semaphores = defaultdict(lambda: asyncio.Semaphore(per_host))
+        
+        semaphore = asyncio.Semaphore(self.config.get('max_concurrent_notes', 4))
+        # Keep-alive connection pool shared by every download of this run
+        connector = aiohttp.TCPConnector(limit=64, limit_per_host=per_host, keepalive_timeout=30)
+        headers = {
+            'User-Agent': self.config['user_agent'],
+            'Referer': 'https://www.bing.com/',
+        }
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [
+                    tg.create_task(self._process_note(session, semaphore, notes[i], i, search_query_text, field_name))
+                    for i, search_query_text in selected
+                ]
+        return [task.result() for task in tasks]
+    
+    def update_notes_with_images(self, notes: List[Dict]) -> List[Dict]:
+        """
+        Update notes by adding images where the image field is empty.
+        
+        Searches and downloads for different notes run concurrently.
+        
+        Args:
+            notes: List of note dictionaries
             
-            updated_notes.append(note)
+        Returns:
+            Updated list of notes with image paths
+        """
+        logger.info(f"Processing {len(notes)} notes for image updates")
+        
+        self._image_pool = ThreadPoolExecutor(max_workers=4)
+        try:
+            results = asyncio.run(self._update_notes_async(notes))
+        finally:
+            self._image_pool.shutdown()
+            self._image_pool = None
+            # Keep what was found even if the run is interrupted
+            self._save_search_cache()
+        # Track which questions got images, their answers, and URLs
+        added_images_info = [info for info in results if info]
+        image_count = len(added_images_info)
         
         logger.info(f"Successfully added {image_count} images to notes")
         # Print summary of added images
@@ -432,7 +828,7 @@ class AnkiImageUpdater:
                 print(f"  Image URL: {info['image_url']}")
         else:
             print("No new images were added.")
-        return updated_notes
+        return notes
     
     def create_anki_deck(self, notes: List[Dict], deck_name: str) -> str:
         """
@@ -445,6 +841,8 @@ class AnkiImageUpdater:
         Returns:
             Path to the created .apkg file
         """
+        import genanki
+        
         logger.info(f"Creating Anki deck: {deck_name}")
         
         # Create deck
@@ -453,6 +851,11 @@ class AnkiImageUpdater:
             deck_name
         )
         
+        # Media files (images): those added in this run, plus images from
+        # earlier runs that notes still reference
+        media_files = dict(self._media_files)
+        images_on_disk = None
+        
         # Add notes to deck
         for note_data in notes:
             # Create note fields
@@ -462,6 +865,15 @@ class AnkiImageUpdater:
                 str(note_data.get(self.config['image_field'], '') or '')
             ]
             
+            image = fields[2]
+            if image and image not in media_files:
+                if images_on_disk is None:
+                    # List the images directory once, only when it is needed
+                    with os.scandir(self.images_path) as entries:
+                        images_on_disk = {entry.name: entry.path for entry in entries if entry.is_file()}
+                if image in images_on_disk:
+                    media_files[image] = images_on_disk[image]
+            
             # Create note
             note = genanki.Note(
                 model=self.model,
@@ -470,14 +882,9 @@ class AnkiImageUpdater:
             
             deck.add_note(note)
         
-        # Add media files (images)
-        media_files = []
-        for image_file in self.images_path.glob('*.jpg'):
-            media_files.append(str(image_file))
-        
         # Create package
-        package = genanki.Package(deck)
-        package.media_files = media_files
+        package = _unjournaled_package_class()(deck)
+        package.media_files = list(media_files.values())
         
         # Save deck
         output_file = self.output_path / f"{deck_name}.apkg"
@@ -539,13 +946,15 @@ def main():
         'images_dir': 'images',
         'delay_between_searches': 1.0,
         'max_image_size': (800, 600),
+        'jpeg_quality': 82,
         'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'search_field': 'answer'
+        'search_field': 'answer',
+        'max_concurrent_notes': 4,
+        'max_requests_per_host': 4
     }
     # Load config if provided
     user_config = {}
     if args.config:
-        import json
         with open(args.config, 'r') as f:
             user_config = json.load(f)
     # Merge configs: default <- user_config <- CLI args